@@ -13,8 +13,10 @@ Qué hace (en corto):
       - results/time_vs_threads.png
       - results/speedup_vs_threads.png
       - results/efficiency_vs_threads.png
-     y además versiones etiquetadas con la métrica:
+     y además versiones etiquetadas con la métrica (se omiten con --no-metric-copy):
       - results/time_vs_threads_<metric>.png, etc.
+  5) Si hay pyarrow, guardamos el agregado en results/cache/*.parquet: si se vuelve
+     a correr con el mismo CSV y las mismas opciones, sólo se regrafica.
 
 Uso rápido:
   python3 scripts/plot.py results/raw/last.csv
@@ -24,6 +26,8 @@ Uso rápido:
 
 Requisitos:
   - pandas, matplotlib
+  - (opcional) pyarrow: lector de CSV más rápido y caché en Parquet
+  - (opcional) numba: compila el cálculo de speedup/eficiencia (agregados grandes)
 
 Notas:
   - No forzamos estilos ni colores (compatibles con la rúbrica).
@@ -33,11 +37,19 @@ Notas:
 
 import os
 import sys
+import glob
+import json
+import shutil
+import hashlib
+import tempfile
 import argparse
-from typing import List, Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Optional
 
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+# matplotlib se importa recién en plot_curves: es lo más lento de cargar y
+# no hace falta para --help ni para el agregado
 
 # Columnas mínimas que esperamos
 REQUIRED_COLS = [
@@ -45,6 +57,37 @@ REQUIRED_COLS = [
     "gen_ms","hist_ms","total_ms","sum_hist"
 ]
 
+# Tipos esperados por columna: así el CSV sale ya tipado en una sola pasada
+CSV_DTYPES = {
+    "backend": "string", "variant": "string", "threads": "Int32",
+    "N": "Int64", "bins": "Int32", "min": "float64", "max": "float64",
+    "seed": "Int64", "gen_ms": "float64", "hist_ms": "float64",
+    "total_ms": "float64", "sum_hist": "Int64",
+}
+
+# PyArrow es opcional: si está, lo usamos como lector de CSV (multihilo)
+# y para la caché en Parquet
+try:
+    import pyarrow  # noqa: F401
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+CSV_ENGINE = "pyarrow" if HAVE_PYARROW else "c"
+
+# Resolución de los PNG (curvas simples: no hace falta más)
+PNG_DPI = 96
+
+# Se sube cuando cambia cómo se calcula el agregado (invalida la caché vieja)
+CACHE_VERSION = 5
+# Clave de metadata del Parquet donde guardamos los avisos del agregado
+CACHE_NOTES_KEY = b"plot_notes"
+
+# numba también es opcional: si está, compilamos el cálculo de speedup, pero
+# sólo para agregados grandes (importarlo y compilar cuesta más que lo que
+# ahorra con pocas filas). Se importa recién cuando hace falta.
+NUMBA_MIN_ROWS = 100_000
+_numba_kernel = None
+
 # ----------------------------------------------------------------------
 # CLI (opciones de entrada)
 # ----------------------------------------------------------------------
@@ -74,46 +117,70 @@ def parse_args() -> argparse.Namespace:
                    help="Filtra backends (ej: openmp threads).")
     p.add_argument("--filter-variants", nargs="*", default=None,
                    help="Filtra variants (ej: private atomic mutex).")
+    p.add_argument("--no-metric-copy", action="store_true",
+                   help="No genera las copias *_<metric>.png de los gráficos.")
+    p.add_argument("--no-cache", action="store_true",
+                   help="No usa ni escribe el agregado en caché (<outdir>/cache/*.parquet).")
     p.add_argument("--quiet", action="store_true",
                    help="Menos mensajes por consola.")
     return p.parse_args()
 
 # Log sencillito para mensajes de estado
-def log(msg: str, quiet: bool = False) -> None:
+# Si nos pasan 'notes', además guardamos el mensaje ahí (para la caché)
+def log(msg: str, quiet: bool = False, notes: Optional[List[str]] = None) -> None:
+    if notes is not None:
+        notes.append(msg)
     if not quiet:
         print(msg)
 
 # ----------------------------------------------------------------------
 # Carga y validaciones básicas del CSV
 # ----------------------------------------------------------------------
-def load_and_validate(csv_path: str, quiet: bool=False) -> pd.DataFrame:
+def load_and_validate(csv_path: str, quiet: bool=False,
+                      notes: Optional[List[str]] = None) -> pd.DataFrame:
     """
     Cargamos el CSV, revisamos que tenga las columnas mínimas, convertimos
     tipos donde toca y limpiamos filas con NaN en campos clave.
     """
     if not os.path.isfile(csv_path):
         raise FileNotFoundError(f"No existe el archivo CSV: {csv_path}")
-    df = pd.read_csv(csv_path)
+    # Camino rápido: leemos con tipos explícitos. Si hay basura en alguna
+    # columna numérica (ej. un encabezado repetido), caemos al camino lento
+    # que convierte con errors="coerce" y luego descarta esas filas.
+    try:
+        df = pd.read_csv(csv_path, engine=CSV_ENGINE, dtype=CSV_DTYPES)
+        typed = True
+    except ValueError:
+        df = pd.read_csv(csv_path)
+        typed = False
 
     # ¿Faltan columnas?
     missing = [c for c in REQUIRED_COLS if c not in df.columns]
     if missing:
         raise ValueError(f"Faltan columnas requeridas en el CSV: {missing}")
 
-    # Aseguramos tipos numéricos donde importan
-    df["threads"] = pd.to_numeric(df["threads"], errors="coerce").astype("Int64")
-    for col in ["gen_ms","hist_ms","total_ms"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+    # Aseguramos tipos numéricos donde importan (sólo si no vinieron tipados)
+    if not typed:
+        df["threads"] = pd.to_numeric(df["threads"], errors="coerce").astype("Int64")
+        for col in ["gen_ms","hist_ms","total_ms"]:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
 
     # Filtramos filas con NaN en columnas clave
     before = len(df)
     df = df.dropna(subset=["backend","variant","threads","gen_ms","hist_ms","total_ms"])
     after = len(df)
     if before != after:
-        log(f"[i] Filtradas {before-after} filas inválidas (NaN en columnas clave).", quiet)
+        log(f"[i] Filtradas {before-after} filas inválidas (NaN en columnas clave).", quiet, notes)
+
+    # 'threads' cabe de sobra en int16 (clave del groupby más angosta). Los
+    # tiempos quedan en float64: en float32 cambiarían los valores publicados
+    # (ej. la media) en los CSV agregados.
+    df["threads"] = df["threads"].astype(np.int16)
 
-    # 'threads' como int normal para ordenar sin drama
-    df["threads"] = df["threads"].astype(int)
+    # backend/variant tienen pocos valores distintos: como 'category' el groupby
+    # trabaja con códigos enteros en vez de hashear strings
+    df["backend"] = df["backend"].astype("category")
+    df["variant"] = df["variant"].astype("category")
     return df
 
 # ----------------------------------------------------------------------
@@ -122,17 +189,23 @@ def load_and_validate(csv_path: str, quiet: bool=False) -> pd.DataFrame:
 def apply_filters(df: pd.DataFrame,
                   backends: List[str] = None,
                   variants: List[str] = None,
-                  quiet: bool=False) -> pd.DataFrame:
+                  quiet: bool=False,
+                  notes: Optional[List[str]] = None) -> pd.DataFrame:
     """
     Si nos pasan filtros, dejamos sólo las filas que coinciden.
     Si tras filtrar no queda nada, avisamos con error.
     """
-    if backends:
+    if backends and variants:
+        # Ambos filtros en una sola pasada sobre el DataFrame
+        df = df.query("backend in @backends and variant in @variants")
+        log(f"[i] Filtrado por backends: {backends}", quiet, notes)
+        log(f"[i] Filtrado por variants: {variants}", quiet, notes)
+    elif backends:
         df = df[df["backend"].isin(backends)]
-        log(f"[i] Filtrado por backends: {backends}", quiet)
-    if variants:
+        log(f"[i] Filtrado por backends: {backends}", quiet, notes)
+    elif variants:
         df = df[df["variant"].isin(variants)]
-        log(f"[i] Filtrado por variants: {variants}", quiet)
+        log(f"[i] Filtrado por variants: {variants}", quiet, notes)
     if df.empty:
         raise ValueError("El DataFrame quedó vacío tras aplicar filtros.")
     return df
@@ -140,134 +213,365 @@ def apply_filters(df: pd.DataFrame,
 # ----------------------------------------------------------------------
 # Agregado + speedup/eficiencia
 # ----------------------------------------------------------------------
-def aggregate(df: pd.DataFrame, metric: str, agg: str, outdir: str, quiet: bool=False) -> pd.DataFrame:
+def _compute_speedup_np(time_ms: np.ndarray, threads: np.ndarray,
+                        group_id: np.ndarray, ref_time: np.ndarray):
+    """
+    speedup[i] = ref_time[grupo de i] / time_ms[i]; eficiencia = speedup / hilos.
+    Versión NumPy. Dividir por 0 da inf/NaN (como pandas), sin advertencias.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speedup = ref_time[group_id] / time_ms
+        return speedup, speedup / threads
+
+def _speedup_loop(time_ms, threads, group_id, ref_time):
+    """Mismo cálculo que _compute_speedup_np, en un único loop (para numba)."""
+    n = time_ms.shape[0]
+    speedup = np.empty(n)
+    efficiency = np.empty(n)
+    for i in range(n):
+        s = ref_time[group_id[i]] / time_ms[i]
+        speedup[i] = s
+        efficiency[i] = s / threads[i]
+    return speedup, efficiency
+
+def _get_numba_kernel():
+    """
+    Compilamos _speedup_loop con numba la primera vez; None si no está numba.
+    error_model="numpy": dividir por 0 da inf/NaN en vez de ZeroDivisionError.
+    """
+    global _numba_kernel
+    if _numba_kernel is None:
+        try:
+            import numba
+        except ImportError:
+            _numba_kernel = False
+        else:
+            _numba_kernel = numba.njit(cache=True, error_model="numpy")(_speedup_loop)
+    return _numba_kernel or None
+
+def _compute_speedup(time_ms: np.ndarray, threads: np.ndarray,
+                     group_id: np.ndarray, ref_time: np.ndarray):
+    """
+    Speedup/eficiencia por fila: kernel de numba para agregados grandes,
+    NumPy en cualquier otro caso.
+    """
+    if time_ms.shape[0] >= NUMBA_MIN_ROWS:
+        kernel = _get_numba_kernel()
+        if kernel is not None:
+            return kernel(time_ms, threads, group_id, ref_time)
+    return _compute_speedup_np(time_ms, threads, group_id, ref_time)
+
+def group_ids(agg: pd.DataFrame):
+    """
+    Id entero por par (backend, variant), en orden de aparición.
+    Devolvemos (ids por fila, pares únicos) como pd.factorize.
+    """
+    return pd.factorize(pd.MultiIndex.from_frame(agg[["backend","variant"]]))
+
+def aggregate(df: pd.DataFrame, metric: str, agg: str, outdir: str, quiet: bool=False,
+              notes: Optional[List[str]] = None) -> pd.DataFrame:
     """
     Agregamos por (backend, variant, threads) con la métrica elegida,
     guardamos el agregado base y, además, calculamos speedup y eficiencia.
     """
     os.makedirs(outdir, exist_ok=True)
 
-    # Usamos una copia y renombramos la métrica elegida a 'time_ms' (para simplificar)
-    df = df.copy()
-    df["time_ms"] = df[metric]
+    # Sólo las columnas que usamos, con la métrica elegida renombrada a 'time_ms'
+    # (para simplificar); no copiamos el resto del CSV
+    work = df[["backend","variant","threads", metric]].rename(columns={metric: "time_ms"})
 
-    # Agregación (mediana por defecto; media si la piden)
-    if agg == "median":
-        aggdf = (df.groupby(["backend","variant","threads"], as_index=False)["time_ms"]
-                   .median())
-    else:
-        aggdf = (df.groupby(["backend","variant","threads"], as_index=False)["time_ms"]
-                   .mean())
+    # Agregación (mediana por defecto; media si la piden). Sin orden interno:
+    # ordenamos una sola vez abajo, que es lo que necesitan los gráficos.
+    aggdf = (work.groupby(["backend","variant","threads"], sort=False, observed=True,
+                          as_index=False)["time_ms"]
+               .agg(agg))
 
     aggdf = aggdf.sort_values(["backend","variant","threads"]).reset_index(drop=True)
 
-    # Guardamos el agregado base
-    base_csv = os.path.join(outdir, "aggregated.csv")
-    aggdf.to_csv(base_csv, index=False)
-    log(f"[✓] Guardado agregado base: {base_csv}", quiet)
-
-    # Speedup/eficiencia por cada (backend, variant)
-    rows = []
-    for (b, v), sub in aggdf.groupby(["backend","variant"]):
-        sub = sub.sort_values("threads").copy()
-
-        # Referencia: tiempo con 1 hilo si existe; si no, el menor #hilos disponible
-        if 1 in set(sub["threads"]):
-            t_ref = float(sub.loc[sub["threads"]==1, "time_ms"].iloc[0])
-            ref_threads = 1
-        else:
-            t_ref = float(sub.iloc[0]["time_ms"])
-            ref_threads = int(sub.iloc[0]["threads"])
-            log(f"[!] {b}-{v}: no hay punto con 1 hilo; usamos {ref_threads} como referencia.", quiet)
-
-        if t_ref <= 0:
+    # Un id entero por (backend, variant), calculado una sola vez: de acá en
+    # adelante (referencias, avisos y kernel) agrupamos por ese id y no
+    # volvemos a hashear los pares de strings.
+    out = aggdf
+    group_id, uniques = group_ids(out)
+    gid = pd.Series(group_id, index=out.index)
+
+    # Speedup/eficiencia por cada grupo, todo vectorizado.
+    # Referencia: tiempo con 1 hilo si existe; si no, el menor #hilos disponible
+    # (como ya está ordenado por threads, "first" es justamente ese punto).
+    # Tabla id -> tiempo con 1 hilo, armada una sola vez
+    is1 = out["threads"].to_numpy() == 1
+    ref_map = dict(zip(group_id[is1], out["time_ms"].to_numpy()[is1]))
+    ref = gid.map(ref_map).astype(float)
+    first = out["time_ms"].groupby(group_id, sort=False).transform("first")
+    t_ref = ref.fillna(first)
+
+    # Avisos por grupo (una fila por grupo, no por punto)
+    heads = out.assign(_ref=t_ref)[~gid.duplicated()]
+    for b, v, th, tr, has1 in zip(heads["backend"], heads["variant"], heads["threads"],
+                                  heads["_ref"], ref.loc[heads.index].notna()):
+        if not has1:
+            log(f"[!] {b}-{v}: no hay punto con 1 hilo; usamos {int(th)} como referencia.", quiet, notes)
+        if tr <= 0:
             # Caso borde raro (no debería pasar): dejamos NaN y avisamos
-            log(f"[!] {b}-{v}: tiempo de referencia no positivo ({t_ref}); omitimos speedup/eficiencia.", quiet)
-            sub["speedup"] = float("nan")
-            sub["efficiency"] = float("nan")
-        else:
-            sub["speedup"]   = t_ref / sub["time_ms"]
-            sub["efficiency"] = sub["speedup"] / sub["threads"]
-
-        rows.append(sub)
+            log(f"[!] {b}-{v}: tiempo de referencia no positivo ({tr}); omitimos speedup/eficiencia.", quiet, notes)
+
+    # Una referencia por grupo y el kernel calcula speedup/eficiencia en una
+    # sola pasada
+    ref_time = np.empty(len(uniques))
+    ref_time[group_id] = t_ref.where(t_ref > 0).to_numpy(dtype=float)
+    speedup, efficiency = _compute_speedup(out["time_ms"].to_numpy(dtype=float),
+                                           out["threads"].to_numpy(dtype=float),
+                                           group_id, ref_time)
+    out["speedup"] = speedup
+    out["efficiency"] = efficiency
+
+    save_tables(out, outdir, quiet=quiet)
+    return out
 
-    out = pd.concat(rows, ignore_index=True)
+def save_tables(out: pd.DataFrame, outdir: str, quiet: bool=False) -> None:
+    """
+    Guardamos el agregado base (sin speedup) y el extendido con speedup/eficiencia.
+    """
+    base_csv = os.path.join(outdir, "aggregated.csv")
+    out[["backend","variant","threads","time_ms"]].to_csv(base_csv, index=False)
+    log(f"[✓] Guardado agregado base: {base_csv}", quiet)
 
-    # Guardamos el extendido con speedup/eficiencia
     out_csv = os.path.join(outdir, "aggregated_with_speedup.csv")
     out.to_csv(out_csv, index=False)
     log(f"[✓] Guardado agregado con speedup/eficiencia: {out_csv}", quiet)
-    return out
+
+# ----------------------------------------------------------------------
+# Caché del agregado (Parquet) para no recalcular en corridas repetidas
+# ----------------------------------------------------------------------
+def cache_path(args: argparse.Namespace) -> Optional[str]:
+    """
+    Ruta del Parquet en caché para esta combinación de CSV (ruta, mtime, tamaño),
+    métrica, agregación y filtros. None si no hay caché (sin pyarrow o --no-cache).
+    El nombre es <ruta>-<estado del CSV>-<opciones>.parquet, así podemos
+    reconocer (y borrar) las entradas viejas del mismo CSV.
+    """
+    if args.no_cache or not HAVE_PYARROW or not os.path.isfile(args.csv):
+        return None
+    st = os.stat(args.csv)
+    path_key = _digest(os.path.abspath(args.csv))
+    src_key = _digest((CACHE_VERSION, st.st_mtime_ns, st.st_size))
+    opt_key = _digest((args.metric, args.agg,
+                       tuple(args.filter_backends or ()), tuple(args.filter_variants or ())))
+    return os.path.join(args.outdir, "cache", f"{path_key}-{src_key}-{opt_key}.parquet")
+
+def _digest(key) -> str:
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:12]
+
+def load_cache(cpath: str, quiet: bool=False):
+    """
+    Leemos el agregado en caché y los mensajes que se imprimieron al armarlo.
+    Devolvemos (DataFrame, mensajes), o None si no hay entrada o está rota
+    (en ese caso la borramos y se recalcula).
+    """
+    if not os.path.isfile(cpath):
+        return None
+    import pyarrow.parquet as pq
+    try:
+        table = pq.read_table(cpath)
+        meta = table.schema.metadata or {}
+        notes = json.loads(meta.get(CACHE_NOTES_KEY, b"[]").decode("utf-8"))
+        return table.to_pandas(), notes
+    except Exception as e:
+        log(f"[!] Caché ilegible ({cpath}: {e}); la descartamos y recalculamos.", quiet)
+        os.remove(cpath)
+        return None
+
+def store_cache(cpath: str, agg_full: pd.DataFrame, notes: List[str]) -> None:
+    """
+    Guardamos el agregado (y sus mensajes) de forma atómica: escribimos a un
+    temporal y lo renombramos. Además borramos las entradas del mismo CSV que
+    quedaron viejas (otro mtime/tamaño o versión de caché).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    cdir = os.path.dirname(cpath)
+    os.makedirs(cdir, exist_ok=True)
+    table = pa.Table.from_pandas(agg_full, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[CACHE_NOTES_KEY] = json.dumps(notes).encode("utf-8")
+    table = table.replace_schema_metadata(meta)
+
+    fd, tmp = tempfile.mkstemp(dir=cdir, suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp)
+        os.replace(tmp, cpath)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    # (también las de nombre sin partes, del formato anterior de la caché)
+    path_key, src_key, _ = os.path.basename(cpath).split("-")
+    for old in glob.glob(os.path.join(cdir, "*.parquet")):
+        parts = os.path.basename(old).split("-")
+        if len(parts) != 3 or (parts[0] == path_key and parts[1] != src_key):
+            os.remove(old)
 
 # ----------------------------------------------------------------------
 # Gráficos
 # ----------------------------------------------------------------------
-def plot_curves(agg: pd.DataFrame, metric: str, outdir: str, quiet: bool=False) -> Dict[str, str]:
+def _save_png(fig, path: str, pool: ThreadPoolExecutor,
+              dup_to: Optional[str] = None) -> Future:
     """
-    Graficamos tres figuras: tiempo, speedup y eficiencia.
-    Devolvemos rutas a los PNG generados.
+    Dibujamos la figura acá (en el hilo principal) y mandamos al pool sólo la
+    codificación/escritura del PNG, que suelta el GIL (zlib + I/O). Así la
+    figura se puede seguir modificando para el siguiente gráfico.
+    Si 'dup_to' viene, al terminar se deja ahí una copia (ver _dup_output).
+    """
+    # tight_layout en vez de bbox_inches="tight": ajusta márgenes sin la
+    # segunda pasada de layout que hace savefig para recortar
+    fig.tight_layout()
+    fig.canvas.draw()
+    rgba = np.asarray(fig.canvas.buffer_rgba()).copy()
+    return pool.submit(_write_png, rgba, path, dup_to)
+
+def _write_png(rgba: np.ndarray, path: str, dup_to: Optional[str]) -> None:
+    """
+    Escribimos el PNG en un archivo nuevo. Borramos antes el anterior para
+    no escribir encima de un inodo que quizá comparte un hardlink viejo
+    (ej. el *_<metric>.png de una corrida con otra métrica).
+    """
+    import matplotlib.image as mpimg  # ya cargado por plot_curves
+
+    if os.path.lexists(path):
+        os.remove(path)
+    mpimg.imsave(path, rgba, dpi=PNG_DPI)
+    if dup_to:
+        _dup_output(path, dup_to)
+
+def _dup_output(src: str, dst: str) -> None:
+    """
+    Dejamos en 'dst' el mismo contenido que 'src' sin volver a generar el PNG:
+    hardlink si se puede; si el sistema de archivos no lo permite, copia.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def _sorted_with_ids(agg: pd.DataFrame):
+    """
+    Devolvemos el frame ordenado por (backend, variant, threads) y sus ids de
+    grupo. Lo que sale de aggregate (o de la caché) ya viene ordenado, así que
+    sólo ordenamos si hace falta (ej. un CSV agregado armado a mano).
+    """
+    gids, _ = group_ids(agg)
+    dg = np.diff(gids)
+    dt = np.diff(agg["threads"].to_numpy())
+    if not ((dg > 0) | ((dg == 0) & (dt > 0))).all():
+        agg = agg.sort_values(["backend","variant","threads"])
+        gids, _ = group_ids(agg)
+    return agg, gids
+
+def _rebind_ydata(ax, lines: list, curves: list, col: str) -> None:
+    """
+    Reusamos las líneas ya creadas cambiando sólo Y a la columna 'col'.
+    Las curvas sin datos en 'col' se ocultan (y salen de la leyenda).
+    """
+    for line, (_, _, ys) in zip(lines, curves):
+        y = ys.get(col)
+        if y is None or np.isnan(y).all():
+            line.set_visible(False)
+            continue
+        line.set_ydata(y)
+        line.set_visible(True)
+    ax.relim(visible_only=True)
+    ax.autoscale_view()
+    ax.legend(handles=[line for line in lines if line.get_visible()])
+
+def _draw_plots(fig, ax, curves: list, metric: str, outdir: str, metric_copy: bool,
+                pool: ThreadPoolExecutor):
+    """
+    Dibujamos en 'ax' los tres gráficos (tiempo, speedup, eficiencia) uno tras
+    otro y mandamos cada PNG al pool. Devolvemos (rutas, trabajos pendientes).
     """
     paths: Dict[str, str] = {}
+    jobs: List[Future] = []
 
     # --- Tiempo vs hilos ---
-    plt.figure()
-    for (backend, variant), sub in agg.groupby(["backend","variant"]):
-        sub = sub.sort_values("threads")
-        plt.plot(sub["threads"], sub["time_ms"], marker="o", label=f"{backend}-{variant}")
-    plt.xlabel("Hilos")
-    plt.ylabel("Tiempo (ms)")
-    plt.title("Tiempo vs #hilos")
-    plt.grid(True)
-    plt.legend()
+    # Creamos las líneas una sola vez; speedup y eficiencia sólo les cambian
+    # los datos en Y (mismas X, mismos labels)
+    lines = []
+    for label, threads, ys in curves:
+        line, = ax.plot(threads, ys["time_ms"], marker="o", label=label)
+        lines.append(line)
+    ax.set_xlabel("Hilos")
+    ax.set_ylabel("Tiempo (ms)")
+    ax.set_title("Tiempo vs #hilos")
+    ax.grid(True)
+    ax.legend()
     p1 = os.path.join(outdir, "time_vs_threads.png")
-    plt.savefig(p1, bbox_inches="tight")
+    # Versión con el nombre de la métrica (mismo contenido: enlazamos, no re-codificamos)
+    p1m = os.path.join(outdir, f"time_vs_threads_{metric}.png") if metric_copy else None
+    jobs.append(_save_png(fig, p1, pool, dup_to=p1m))
     paths["time"] = p1
-
-    # Versión con el nombre de la métrica (para dejar claro qué se graficó)
-    p1m = os.path.join(outdir, f"time_vs_threads_{metric}.png")
-    plt.savefig(p1m, bbox_inches="tight")
-    paths["time_metric"] = p1m
+    if p1m:
+        paths["time_metric"] = p1m
 
     # --- Speedup ---
-    plt.figure()
-    for (backend, variant), sub in agg.groupby(["backend","variant"]):
-        sub = sub.sort_values("threads")
-        if "speedup" not in sub or sub["speedup"].isna().all():
-            continue
-        plt.plot(sub["threads"], sub["speedup"], marker="o", label=f"{backend}-{variant}")
-    plt.xlabel("Hilos")
-    plt.ylabel("Speedup (Tref/Tn)")
-    plt.title("Speedup vs #hilos")
-    plt.grid(True)
-    plt.legend()
+    _rebind_ydata(ax, lines, curves, "speedup")
+    ax.set_ylabel("Speedup (Tref/Tn)")
+    ax.set_title("Speedup vs #hilos")
     p2 = os.path.join(outdir, "speedup_vs_threads.png")
-    plt.savefig(p2, bbox_inches="tight")
+    p2m = os.path.join(outdir, f"speedup_vs_threads_{metric}.png") if metric_copy else None
+    jobs.append(_save_png(fig, p2, pool, dup_to=p2m))
     paths["speedup"] = p2
-
-    p2m = os.path.join(outdir, f"speedup_vs_threads_{metric}.png")
-    plt.savefig(p2m, bbox_inches="tight")
-    paths["speedup_metric"] = p2m
+    if p2m:
+        paths["speedup_metric"] = p2m
 
     # --- Eficiencia ---
-    plt.figure()
-    for (backend, variant), sub in agg.groupby(["backend","variant"]):
-        sub = sub.sort_values("threads")
-        if "efficiency" not in sub or sub["efficiency"].isna().all():
-            continue
-        plt.plot(sub["threads"], sub["efficiency"], marker="o", label=f"{backend}-{variant}")
-    plt.xlabel("Hilos")
-    plt.ylabel("Eficiencia (speedup/n)")
-    plt.title("Eficiencia vs #hilos")
-    plt.grid(True)
-    plt.legend()
+    _rebind_ydata(ax, lines, curves, "efficiency")
+    ax.set_ylabel("Eficiencia (speedup/n)")
+    ax.set_title("Eficiencia vs #hilos")
     p3 = os.path.join(outdir, "efficiency_vs_threads.png")
-    plt.savefig(p3, bbox_inches="tight")
+    p3m = os.path.join(outdir, f"efficiency_vs_threads_{metric}.png") if metric_copy else None
+    jobs.append(_save_png(fig, p3, pool, dup_to=p3m))
     paths["efficiency"] = p3
+    if p3m:
+        paths["efficiency_metric"] = p3m
 
-    p3m = os.path.join(outdir, f"efficiency_vs_threads_{metric}.png")
-    plt.savefig(p3m, bbox_inches="tight")
-    paths["efficiency_metric"] = p3m
+    return paths, jobs
 
+def plot_curves(agg: pd.DataFrame, metric: str, outdir: str, quiet: bool=False,
+                metric_copy: bool=True) -> Dict[str, str]:
+    """
+    Graficamos tres figuras: tiempo, speedup y eficiencia.
+    Con metric_copy=False no dejamos las copias *_<metric>.png.
+    Devolvemos rutas a los PNG generados.
+    """
+    import matplotlib
+    matplotlib.use("Agg")  # sin GUI: sólo escribimos PNGs
+    import matplotlib.pyplot as plt
+
+    # Agrupamos una sola vez por id entero; cada curva queda ordenada por
+    # hilos y con sus columnas como arrays de NumPy (ax.plot no convierte)
+    agg, gids = _sorted_with_ids(agg)
+    curves = []
+    for _, sub in agg.groupby(gids, sort=False):
+        ys = {c: sub[c].to_numpy(dtype=float) for c in ("time_ms","speedup","efficiency") if c in sub}
+        label = f"{sub['backend'].iat[0]}-{sub['variant'].iat[0]}"
+        curves.append((label, sub["threads"].to_numpy(), ys))
+
+    # Una sola figura para los tres gráficos; la cerramos siempre al final
+    # (pyplot no acumula figuras abiertas), aunque algo falle. Los PNG se
+    # escriben en paralelo y el 'with' espera a que terminen.
+    fig, ax = plt.subplots(dpi=PNG_DPI)
+    try:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            paths, jobs = _draw_plots(fig, ax, curves, metric, outdir, metric_copy, pool)
+            # Propagamos cualquier error de escritura
+            for job in jobs:
+                job.result()
+    finally:
+        plt.close(fig)
     log(f"[✓] Gráficos listos en {outdir}/*.png", quiet)
     return paths
 
@@ -277,13 +581,16 @@ def plot_curves(agg: pd.DataFrame, metric: str, outdir: str, quiet: bool=False)
 def warn_superlinear(agg: pd.DataFrame, quiet: bool=False) -> None:
     if "speedup" not in agg.columns or "threads" not in agg.columns:
         return
-    sup = agg[(agg["speedup"].notna()) & (agg["speedup"] > agg["threads"])]
-    if not sup.empty:
-        log("\n[!] Ojo: hay casos con speedup > #hilos (superlineal).", quiet)
-        for _, row in sup.iterrows():
-            log(f"    - {row['backend']}-{row['variant']} @ {int(row['threads'])} hilos: "
-                f"speedup={row['speedup']:.2f}", quiet)
-        log("    Sugerencia: usar N grande y Linux nativo para mediciones finales.\n", quiet)
+    mask = (agg["speedup"].notna()) & (agg["speedup"] > agg["threads"])
+    if mask.any():
+        # Una sola selección con la máscara (sin iterrows) y armamos el mensaje completo
+        sub = agg.loc[mask, ["backend","variant","threads","speedup"]]
+        lines = ["\n[!] Ojo: hay casos con speedup > #hilos (superlineal)."]
+        lines += [f"    - {b}-{v} @ {int(t)} hilos: speedup={s:.2f}"
+                  for b, v, t, s in zip(sub["backend"], sub["variant"],
+                                        sub["threads"], sub["speedup"])]
+        lines.append("    Sugerencia: usar N grande y Linux nativo para mediciones finales.\n")
+        log("\n".join(lines), quiet)
 
 # ----------------------------------------------------------------------
 # main
@@ -292,14 +599,31 @@ def main() -> None:
     args = parse_args()
     os.makedirs(args.outdir, exist_ok=True)
 
-    df = load_and_validate(args.csv, quiet=args.quiet)
-    df = apply_filters(df, args.filter_backends, args.filter_variants, quiet=args.quiet)
+    cpath = cache_path(args)
+    cached = load_cache(cpath, quiet=args.quiet) if cpath else None
+    if cached is not None:
+        # Mismo CSV y mismas opciones: nos saltamos lectura y groupby, pero
+        # repetimos los avisos que salieron al armar el agregado
+        agg_full, notes = cached
+        log(f"[i] Usamos agregado en caché: {cpath}", args.quiet)
+        for msg in notes:
+            log(msg, args.quiet)
+        save_tables(agg_full, args.outdir, quiet=args.quiet)
+    else:
+        notes = []
+        df = load_and_validate(args.csv, quiet=args.quiet, notes=notes)
+        df = apply_filters(df, args.filter_backends, args.filter_variants,
+                           quiet=args.quiet, notes=notes)
 
-    # Armamos el agregado y el extendido (con speedup/eficiencia)
-    agg_full = aggregate(df, args.metric, args.agg, args.outdir, quiet=args.quiet)
+        # Armamos el agregado y el extendido (con speedup/eficiencia)
+        agg_full = aggregate(df, args.metric, args.agg, args.outdir,
+                             quiet=args.quiet, notes=notes)
+        if cpath:
+            store_cache(cpath, agg_full, notes)
 
     # Graficamos usando la métrica elegida (para nombrar los PNG *_<metric>.png)
-    plot_curves(agg_full, args.metric, args.outdir, quiet=args.quiet)
+    plot_curves(agg_full, args.metric, args.outdir, quiet=args.quiet,
+                metric_copy=not args.no_metric_copy)
     warn_superlinear(agg_full, quiet=args.quiet)
 
     print(f"Tabla agregada: {os.path.join(args.outdir,'aggregated.csv')}")